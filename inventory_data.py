@@ -1,10 +1,16 @@
 import os
+import atexit
+import hashlib
 import logging
+import tempfile
+from contextlib import contextmanager
 from typing import Dict, Any, Optional
 
 import streamlit as st
+import numba
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import pyarrow as pa
 import plotly.graph_objects as go
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
@@ -21,6 +27,53 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# On-disk snapshot of the inventory query, reused until it is older than the TTL
+CACHE_DIR = os.getenv('CACHE_DIR', 'cache')
+CACHE_TTL = int(os.getenv('CACHE_TTL', '3600'))
+# Errors that mean a snapshot file is missing, truncated or not valid Parquet
+SNAPSHOT_ERRORS = (OSError, ValueError, pa.ArrowException)
+
+COGS_COLUMNS = ['Total_COGS', 'COGS_WH', 'COGS_WIP', 'COGS_EXLPICK']
+FILTER_COLUMNS = ['pt_prod_line', 'pt_dsgn_grp', 'pt__chr02']
+
+# Per-part inventory valuation
+INVENTORY_QUERY = """
+    SELECT 
+        pt_part,
+        pt_desc1,
+        pt_dsgn_grp,
+        pt_prod_line,
+        pt__chr02,
+        total_qty_avail,
+        ROUND(Total_COGS, 2) as Total_COGS,
+        ROUND(COGS_WH, 2) as COGS_WH,
+        ROUND(COGS_WIP, 2) as COGS_WIP,
+        ROUND(COGS_EXLPICK, 2) as COGS_EXLPICK
+    FROM (
+        SELECT 
+            pt_part,
+            pt_desc1,
+            pt_dsgn_grp,
+            pt_prod_line,
+            pt__chr02,
+            SUM(qty_avail) as total_qty_avail,
+            SUM(qty_avail * pt_cost) as Total_COGS,
+            SUM(CASE WHEN ld_loc = 'WH' THEN qty_avail * pt_cost ELSE 0 END) as COGS_WH,
+            SUM(CASE WHEN ld_loc = 'WIP' THEN qty_avail * pt_cost ELSE 0 END) as COGS_WIP,
+            SUM(CASE WHEN ld_loc = 'EXLPICK' THEN qty_avail * pt_cost ELSE 0 END) as COGS_EXLPICK
+        FROM part_master
+        JOIN location_detail ON pt_part = ld_part
+        WHERE qty_avail > 0
+        GROUP BY pt_part, pt_desc1, pt_dsgn_grp, pt_prod_line, pt__chr02
+    ) subquery
+"""
+# Filter columns are low-cardinality; pt_part is unique per row and stays object
+INVENTORY_DTYPES = {
+    **{col: 'category' for col in FILTER_COLUMNS},
+    'total_qty_avail': 'float64',
+    **{col: 'float64' for col in COGS_COLUMNS},
+}
+
 def get_connection_string():
     """Generate database connection string based on environment variables"""
     db_type = os.getenv('DB_TYPE', 'mssql')
@@ -42,74 +95,173 @@ def get_connection_string():
     else:
         raise ValueError(f"Unsupported database type: {db_type}")
 
-from contextlib import contextmanager
+@st.cache_resource
+def get_engine():
+    """Single pooled engine for the process; connections are checked out per query"""
+    engine = create_engine(get_connection_string(), pool_size=5, pool_pre_ping=True)
+    atexit.register(engine.dispose)
+    return engine
+
 
 @contextmanager
 def get_connection():
     """Context manager for database connections using SQLAlchemy"""
-    engine = None
     try:
-        connection_string = get_connection_string()
-        engine = create_engine(connection_string)
         print(f"Attempting to connect to database...")
-        with engine.connect() as connection:
-            print("Successfully connected to database")
-            yield connection
+        connection = get_engine().connect()
+        print("Successfully connected to database")
     except Exception as e:
         print(f"Detailed database connection error: {str(e)}")
         st.error(f"Database connection error: {str(e)}")
         yield None
-    finally:
-        if engine:
-            engine.dispose()
-            print("Database connection closed")
+        return
+
+    # Closing the connection checks it back into the engine's pool
+    with connection:
+        yield connection
+
+
+class InventoryValidationError(ValueError):
+    """Raised when loaded inventory data breaks an assumption the dashboard relies on"""
+
+
+@numba.njit(cache=True)
+def groupby_sum(codes, values, n_groups):
+    """Sum the rows of values into buckets by categorical code, skipping missing codes and NaNs"""
+    out = np.zeros((n_groups, values.shape[1]))
+    for i in range(codes.size):
+        code = codes[i]
+        if code < 0:
+            continue
+        for j in range(values.shape[1]):
+            if not np.isnan(values[i, j]):
+                out[code, j] += values[i, j]
+    return out
 
 
 class InventoryDataProcessor:
     """
     Advanced data processing and analysis for inventory management
     """
+    @staticmethod
+    @st.cache_data(max_entries=1)
+    def read_inventory_snapshot(cache_path: str, mtime: float) -> pd.DataFrame:
+        """
+        Read a Parquet snapshot, held in memory for as long as the file is unchanged
+        """
+        logger.info("Loading inventory data from cache %s", cache_path)
+        return pd.read_parquet(cache_path, memory_map=True)
+
     @staticmethod
     def load_inventory_data():
         """
         Load and process inventory data with comprehensive error handling
+
+        Query results are persisted as Parquet in CACHE_DIR, keyed by the database
+        settings and query hash, and read back from disk until the file is older
+        than CACHE_TTL; unreadable snapshots are discarded and re-queried.
+        Returns the frame with a snapshot token identifying that data, for use in
+        downstream cache keys. Raises ConnectionError when the database cannot be
+        reached.
         """
-        query = text("""
-            SELECT 
-                pt_part,
-                pt_desc1,
-                pt_dsgn_grp,
-                pt_prod_line,
-                pt__chr02,
-                total_qty_avail,
-                ROUND(Total_COGS, 2) as Total_COGS,
-                ROUND(COGS_WH, 2) as COGS_WH,
-                ROUND(COGS_WIP, 2) as COGS_WIP,
-                ROUND(COGS_EXLPICK, 2) as COGS_EXLPICK
-            FROM (
-                SELECT 
-                    pt_part,
-                    pt_desc1,
-                    pt_dsgn_grp,
-                    pt_prod_line,
-                    pt__chr02,
-                    SUM(qty_avail) as total_qty_avail,
-                    SUM(qty_avail * pt_cost) as Total_COGS,
-                    SUM(CASE WHEN ld_loc = 'WH' THEN qty_avail * pt_cost ELSE 0 END) as COGS_WH,
-                    SUM(CASE WHEN ld_loc = 'WIP' THEN qty_avail * pt_cost ELSE 0 END) as COGS_WIP,
-                    SUM(CASE WHEN ld_loc = 'EXLPICK' THEN qty_avail * pt_cost ELSE 0 END) as COGS_EXLPICK
-                FROM part_master
-                JOIN location_detail ON pt_part = ld_part
-                WHERE qty_avail > 0
-                GROUP BY pt_part, pt_desc1, pt_dsgn_grp, pt_prod_line, pt__chr02
-            ) subquery
-            ORDER BY Total_COGS DESC
-        """)
-        
+        query = text(f"{INVENTORY_QUERY}    ORDER BY Total_COGS DESC")
+        # Settings are hashed as-is so configuration errors still surface in get_connection
+        database = '|'.join(
+            os.getenv(name, '')
+            for name in ('DB_TYPE', 'DB_SERVER', 'DB_PORT', 'DB_NAME', 'DB_USER'))
+        cache_key = hashlib.sha1(f"{database}\n{query}".encode()).hexdigest()
+        cache_path = os.path.join(CACHE_DIR, f"{cache_key}.parquet")
+
+        if (os.path.exists(cache_path)
+                and time.time() - os.path.getmtime(cache_path) < CACHE_TTL):
+            mtime = os.path.getmtime(cache_path)
+            try:
+                return (InventoryDataProcessor.read_inventory_snapshot(cache_path, mtime),
+                        f"{cache_key}@{mtime}")
+            except SNAPSHOT_ERRORS as e:
+                logger.warning("Discarding unreadable inventory cache %s: %s", cache_path, e)
+                try:
+                    os.remove(cache_path)
+                except OSError:
+                    pass
+
         with get_connection() as conn:
-            if conn:
-                return pd.read_sql(query, conn)
-            return pd.DataFrame()
+            if not conn:
+                raise ConnectionError("Inventory database is unavailable")
+            df = pd.read_sql_query(query, conn, dtype=INVENTORY_DTYPES)
+
+        # The query groups by part, so row counts double as unique part counts
+        if not df['pt_part'].is_unique:
+            raise InventoryValidationError(
+                "Inventory query returned duplicate pt_part rows")
+
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # A private temp file per writer, so concurrent refreshes never share one
+            fd, tmp_path = tempfile.mkstemp(
+                dir=CACHE_DIR, prefix=f"{cache_key}-", suffix='.tmp')
+            os.close(fd)
+            try:
+                df.to_parquet(tmp_path, compression='zstd', index=False)
+                os.replace(tmp_path, cache_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        except SNAPSHOT_ERRORS as e:
+            # Without a snapshot every rerun queries the database again
+            logger.warning("Could not write inventory cache %s: %s", cache_path, e)
+            return df, f"{cache_key}@{time.time()}"
+
+        return df, f"{cache_key}@{os.path.getmtime(cache_path)}"
+
+    @staticmethod
+    def aggregate_design_groups(df: pd.DataFrame, cogs_columns: list) -> pd.DataFrame:
+        """
+        Total COGS per design group via a bucketed sum over the category codes
+        """
+        groups = df['pt_dsgn_grp']
+        totals = groupby_sum(
+            groups.cat.codes.to_numpy(),
+            df[cogs_columns].to_numpy(dtype=np.float64),
+            len(groups.cat.categories)
+        )
+        design_group_data = pd.DataFrame(totals, columns=cogs_columns)
+        design_group_data.insert(0, 'pt_dsgn_grp', groups.cat.categories)
+        return design_group_data
+
+    @staticmethod
+    def get_top_parts(df: pd.DataFrame, cogs_column: str, n: int = 10) -> pd.DataFrame:
+        """
+        Select the n highest-COGS parts with an O(N) partition instead of a full sort
+        """
+        values = df[cogs_column].to_numpy(dtype=np.float64)
+        # Like nlargest, parts without a COGS value are never ranked
+        candidates = np.flatnonzero(~np.isnan(values))
+        n = min(n, candidates.size)
+        if n == 0:
+            return df.iloc[:0][['pt_part', 'pt_desc1', cogs_column]]
+
+        kth = candidates.size - n
+        idx = candidates[np.argpartition(values[candidates], kth)[kth:]]
+        idx = idx[np.argsort(values[idx])[::-1]]
+        return df.iloc[idx][['pt_part', 'pt_desc1', cogs_column]]
+
+    @staticmethod
+    @st.cache_data(ttl=CACHE_TTL, max_entries=64)
+    def get_inventory_aggregates(_filtered_df: pd.DataFrame, snapshot: str,
+                                 filters: tuple = ()) -> dict:
+        """
+        Chart aggregates for every COGS type, computed once per data snapshot
+        and filter selection; the frame itself is not hashed
+        """
+        return {
+            'agg_by_dsgn_grp': InventoryDataProcessor.aggregate_design_groups(
+                _filtered_df, COGS_COLUMNS),
+            'top10_by_cogs': {
+                col: InventoryDataProcessor.get_top_parts(_filtered_df, col)
+                for col in COGS_COLUMNS
+            },
+        }
 
 
 class InventoryDashboard:
@@ -117,60 +269,117 @@ class InventoryDashboard:
     Streamlit Dashboard for Inventory Management
     """
     @staticmethod
-    def create_design_group_chart(df: pd.DataFrame, cogs_column: str):
-        """Create design group distribution chart"""
-        design_group_data = df.groupby('pt_dsgn_grp')[cogs_column].sum().reset_index()
-
-        fig = px.pie(
-            design_group_data,
-            values=cogs_column,
-            names='pt_dsgn_grp',
-            title=f'Inventory Distribution by Design Group',
-            hole=0.4
+    def create_inventory_charts():
+        """Create empty design group distribution and top parts charts"""
+        design_chart = go.Figure(go.Pie(hole=0.4))
+        design_chart.update_layout(title_text='Inventory Distribution by Design Group')
+
+        top_parts_chart = go.Figure(go.Bar())
+        top_parts_chart.update_layout(xaxis_type='category', xaxis_title_text='pt_part')
+        return design_chart, top_parts_chart
+
+    @staticmethod
+    def update_inventory_charts(charts: tuple, design_group_data: pd.DataFrame,
+                                top_parts: pd.DataFrame, cogs_column: str):
+        """Push new data into existing charts instead of rebuilding the figures"""
+        design_chart, top_parts_chart = charts
+        design_chart.update_traces(
+            labels=design_group_data['pt_dsgn_grp'],
+            values=design_group_data[cogs_column]
+        )
+
+        top_parts_chart.update_traces(
+            x=top_parts['pt_part'],
+            y=top_parts[cogs_column],
+            customdata=top_parts['pt_desc1'],
+            hovertemplate=(
+                "Part: %{x}<br>Description: %{customdata}<br>"
+                f"{cogs_column}: $%{{y:,.2f}}<extra></extra>"
+            )
+        )
+        top_parts_chart.update_layout(
+            title_text=f'Top {len(top_parts)} Parts by {cogs_column}',
+            yaxis_title_text=cogs_column
         )
-        return fig
+        return charts
+
+    @staticmethod
+    def get_inventory_charts(filtered_df: pd.DataFrame, snapshot: str,
+                             cogs_column: str, filters: tuple = ()):
+        """Return this session's charts, updated in place for the current selection"""
+        aggregates = InventoryDataProcessor.get_inventory_aggregates(
+            filtered_df, snapshot, filters)
+        design_group_data = aggregates['agg_by_dsgn_grp'][['pt_dsgn_grp', cogs_column]]
+        # Skip groups with no COGS of the selected type in this selection
+        design_group_data = design_group_data[design_group_data[cogs_column] != 0]
+        top_parts = aggregates['top10_by_cogs'][cogs_column]
+
+        if 'inventory_charts' not in st.session_state:
+            st.session_state.inventory_charts = InventoryDashboard.create_inventory_charts()
+        return InventoryDashboard.update_inventory_charts(
+            st.session_state.inventory_charts, design_group_data, top_parts, cogs_column)
 
     @staticmethod
-    def display_dashboard(df: pd.DataFrame):
+    def apply_filters(df: pd.DataFrame, filters: Dict[str, list]) -> pd.DataFrame:
+        """Select rows matching every active filter with a single combined mask"""
+        mask = np.ones(len(df), dtype=bool)
+        for col, values in filters.items():
+            if values:
+                mask &= df[col].isin(values).to_numpy()
+        return df.loc[mask]
+
+    @staticmethod
+    def display_dashboard(df: pd.DataFrame, snapshot: str):
         """Comprehensive dashboard display"""
         st.title("Inventory Management Dashboard")
 
         # Sidebar filters
         st.sidebar.header("Filters")
 
+        cogs_column = st.sidebar.selectbox("COGS Type", COGS_COLUMNS)
+
         # Dynamic filter generation
-        filter_columns = ['pt_prod_line', 'pt_dsgn_grp']
         filters = {}
-        for col in filter_columns:
-            unique_values = df[col].dropna().unique()
+        for col in FILTER_COLUMNS:
+            # Categories are already unique, sorted and free of NaN
             filters[col] = st.sidebar.multiselect(
-                f"Filter by {col}", unique_values)
+                f"Filter by {col}", list(df[col].cat.categories))
 
         # Apply filters
-        filtered_df = df.copy()
-        for col, values in filters.items():
-            if values:
-                filtered_df = filtered_df[filtered_df[col].isin(values)]
+        filtered_df = InventoryDashboard.apply_filters(df, filters)
 
         # Key metrics
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Unique Parts", filtered_df['pt_part'].nunique())
+            st.metric("Total Unique Parts", len(filtered_df))
         with col2:
             st.metric("Total COGS", f"${filtered_df['Total_COGS'].sum():,.2f}")
         with col3:
             st.metric("Average Part Cost", f"${
                       filtered_df['Total_COGS'].mean():,.2f}")
 
-        # Visualizations
+        # Visualizations, cached per COGS type and filter selection
+        filter_key = tuple(
+            (col, tuple(sorted(values))) for col, values in filters.items())
+        design_chart, top_parts_chart = InventoryDashboard.get_inventory_charts(
+            filtered_df, snapshot, cogs_column, filter_key)
+
         col1, col2 = st.columns(2)
         with col1:
-            design_chart = InventoryDashboard.create_design_group_chart(
-                filtered_df, 'Total_COGS')
-            st.plotly_chart(design_chart)
+            st.plotly_chart(design_chart, use_container_width=True,
+                            key='design_group_chart')
+        with col2:
+            st.plotly_chart(top_parts_chart, use_container_width=True,
+                            key='top_parts_chart')
 
-        # Detailed data table
-        st.dataframe(filtered_df)
+        # Detailed data table; currency formatting happens client-side
+        st.dataframe(
+            filtered_df,
+            column_config={
+                col: st.column_config.NumberColumn(format="$%.2f")
+                for col in COGS_COLUMNS
+            }
+        )
 
 
 def main():
@@ -182,12 +391,17 @@ def main():
     )
 
     # Load data
-    inventory_data = InventoryDataProcessor.load_inventory_data()
-
-    if inventory_data is not None:
-        InventoryDashboard.display_dashboard(inventory_data)
-    else:
+    try:
+        inventory_data, snapshot = InventoryDataProcessor.load_inventory_data()
+    except ConnectionError:
         st.warning("No inventory data available")
+        return
+    except InventoryValidationError as e:
+        logger.error("Inventory data failed validation: %s", e)
+        st.error(f"Inventory data failed validation: {e}")
+        return
+
+    InventoryDashboard.display_dashboard(inventory_data, snapshot)
 
 
 if __name__ == "__main__":
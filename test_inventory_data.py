@@ -0,0 +1,204 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("numba")
+inventory_data = pytest.importorskip("inventory_data")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+
+def pandas_group_sums(codes, values, n_groups):
+    """Reference result: pandas groupby over the same codes, zero-filled"""
+    frame = pd.DataFrame(values)
+    sums = frame[codes >= 0].groupby(codes[codes >= 0]).sum()
+    return sums.reindex(range(n_groups), fill_value=0.0).to_numpy()
+
+
+def random_group_data(seed, n_rows=100_003, n_groups=7):
+    """Codes including missing (-1) entries and values with ~1% NaNs"""
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(-1, n_groups, n_rows).astype(np.int8)
+    values = rng.random((n_rows, 4))
+    values[rng.random((n_rows, 4)) < 0.01] = np.nan
+    return codes, values, n_groups
+
+
+def test_groupby_sum_matches_pandas():
+    codes, values, n_groups = random_group_data(0)
+
+    result = inventory_data.groupby_sum(codes, values, n_groups)
+
+    np.testing.assert_allclose(result, pandas_group_sums(codes, values, n_groups))
+
+
+def test_groupby_sum_from_concurrent_threads():
+    # Streamlit runs each session's script on its own thread
+    inputs = [random_group_data(seed) for seed in range(8)]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda args: inventory_data.groupby_sum(*args), inputs))
+
+    for args, result in zip(inputs, results):
+        np.testing.assert_allclose(result, pandas_group_sums(*args))
+
+
+def test_groupby_sum_skips_missing_codes_and_nans():
+    codes = np.array([1, -1, 1], dtype=np.int8)
+    values = np.array([[1.0, 2.0], [5.0, 5.0], [np.nan, 3.0]])
+
+    result = inventory_data.groupby_sum(codes, values, 3)
+
+    np.testing.assert_array_equal(result, [[0.0, 0.0], [1.0, 5.0], [0.0, 0.0]])
+
+
+def test_groupby_sum_empty():
+    result = inventory_data.groupby_sum(
+        np.zeros(0, dtype=np.int8), np.zeros((0, 4)), 3)
+
+    np.testing.assert_array_equal(result, np.zeros((3, 4)))
+
+
+def test_aggregate_design_groups_matches_pandas():
+    df = pd.DataFrame({
+        'pt_dsgn_grp': pd.Categorical(['a', 'b', None, 'a', 'c']),
+        'Total_COGS': [1.0, 2.0, 3.0, np.nan, 0.0],
+        'COGS_WH': [1.0, 0.0, 1.0, 1.0, 0.0],
+    })
+    cogs_columns = ['Total_COGS', 'COGS_WH']
+
+    result = inventory_data.InventoryDataProcessor.aggregate_design_groups(
+        df, cogs_columns)
+
+    expected = df.groupby('pt_dsgn_grp', observed=False)[cogs_columns].sum()
+    assert list(result['pt_dsgn_grp']) == list(expected.index)
+    np.testing.assert_allclose(result[cogs_columns].to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize("n_rows", [50, 3])
+def test_get_top_parts_skips_missing_cogs(n_rows):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        'pt_part': [f"P{i:03d}" for i in range(n_rows)],
+        'pt_desc1': 'desc',
+        'Total_COGS': rng.random(n_rows),
+    })
+    df.loc[1, 'Total_COGS'] = np.nan
+
+    result = inventory_data.InventoryDataProcessor.get_top_parts(df, 'Total_COGS')
+
+    expected = df.dropna(subset=['Total_COGS']).nlargest(10, 'Total_COGS')
+    assert list(result['pt_part']) == list(expected['pt_part'])
+
+
+@pytest.fixture
+def inventory_db(tmp_path, monkeypatch):
+    """SQLite stand-in for the inventory tables, with a counter of inventory queries"""
+    engine = sqlalchemy.create_engine(
+        f"sqlite:///{tmp_path / 'inventory.db'}",
+        connect_args={'check_same_thread': False})
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE part_master (pt_part TEXT, pt_desc1 TEXT, pt_dsgn_grp TEXT,"
+            " pt_prod_line TEXT, pt__chr02 TEXT, pt_cost REAL)")
+        conn.exec_driver_sql(
+            "CREATE TABLE location_detail (ld_part TEXT, ld_loc TEXT, qty_avail REAL)")
+        conn.exec_driver_sql(
+            "INSERT INTO part_master VALUES"
+            " ('P1', 'Bolt', 'G1', 'L1', 'A', 2.0),"
+            " ('P2', 'Nut', 'G2', 'L1', 'B', 1.0),"
+            " ('P3', 'Washer', 'G1', 'L2', 'A', 0.5)")
+        conn.exec_driver_sql(
+            "INSERT INTO location_detail VALUES"
+            " ('P1', 'WH', 10), ('P1', 'WIP', 5), ('P2', 'EXLPICK', 4), ('P3', 'WH', 8)")
+
+    queries = []
+    sqlalchemy.event.listen(
+        engine, 'before_cursor_execute',
+        lambda conn, cursor, statement, *args: queries.append(statement)
+        if 'FROM part_master' in statement else None)
+
+    monkeypatch.setattr(inventory_data, 'get_engine', lambda: engine)
+    monkeypatch.setattr(inventory_data, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(inventory_data, 'CACHE_TTL', 3600)
+    inventory_data.InventoryDataProcessor.read_inventory_snapshot.clear()
+    yield engine, queries
+    engine.dispose()
+
+
+def snapshot_files():
+    return sorted(os.listdir(inventory_data.CACHE_DIR))
+
+
+def test_load_reuses_snapshot_within_ttl(inventory_db):
+    _, queries = inventory_db
+
+    df, snapshot = inventory_data.InventoryDataProcessor.load_inventory_data()
+    cached_df, cached_snapshot = inventory_data.InventoryDataProcessor.load_inventory_data()
+
+    assert len(queries) == 1
+    assert cached_snapshot == snapshot
+    pd.testing.assert_frame_equal(cached_df, df)
+    assert [name for name in snapshot_files() if not name.endswith('.parquet')] == []
+
+
+def test_snapshot_round_trip_keeps_categoricals(inventory_db):
+    inventory_data.InventoryDataProcessor.load_inventory_data()
+    df, _ = inventory_data.InventoryDataProcessor.load_inventory_data()
+
+    for col in inventory_data.FILTER_COLUMNS:
+        assert isinstance(df[col].dtype, pd.CategoricalDtype)
+    assert list(df['pt_dsgn_grp'].cat.categories) == ['G1', 'G2']
+    assert df.set_index('pt_part').loc['P1', 'COGS_WIP'] == 10.0
+
+
+def test_expired_snapshot_is_requeried(inventory_db):
+    engine, queries = inventory_db
+    _, snapshot = inventory_data.InventoryDataProcessor.load_inventory_data()
+
+    expired = time.time() - 2 * inventory_data.CACHE_TTL
+    for name in snapshot_files():
+        os.utime(os.path.join(inventory_data.CACHE_DIR, name), (expired, expired))
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE part_master SET pt_cost = 3.0 WHERE pt_part = 'P2'")
+
+    df, new_snapshot = inventory_data.InventoryDataProcessor.load_inventory_data()
+
+    assert len(queries) == 2
+    assert new_snapshot != snapshot
+    assert df.set_index('pt_part').loc['P2', 'Total_COGS'] == 12.0
+
+
+def test_unreadable_snapshot_is_discarded_and_requeried(inventory_db):
+    _, queries = inventory_db
+    expected, _ = inventory_data.InventoryDataProcessor.load_inventory_data()
+    (name,) = snapshot_files()
+    with open(os.path.join(inventory_data.CACHE_DIR, name), 'wb') as f:
+        f.write(b'not parquet')
+
+    df, _ = inventory_data.InventoryDataProcessor.load_inventory_data()
+    reloaded, _ = inventory_data.InventoryDataProcessor.load_inventory_data()
+
+    assert len(queries) == 2
+    pd.testing.assert_frame_equal(df, expected)
+    pd.testing.assert_frame_equal(reloaded, expected)
+
+
+def test_concurrent_refreshes_publish_one_complete_snapshot(inventory_db, monkeypatch):
+    # A zero TTL makes every call re-query and rewrite the snapshot
+    monkeypatch.setattr(inventory_data, 'CACHE_TTL', 0)
+    expected, _ = inventory_data.InventoryDataProcessor.load_inventory_data()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(
+            lambda _: inventory_data.InventoryDataProcessor.load_inventory_data()[0],
+            range(16)))
+
+    for df in results:
+        pd.testing.assert_frame_equal(df, expected)
+    (name,) = snapshot_files()
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(os.path.join(inventory_data.CACHE_DIR, name)), expected)